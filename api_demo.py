@@ -3,120 +3,277 @@ Simple API Demo for Edtech Questions Database
 This demonstrates how to query the database for different use cases
 """
 
+import copy
+import json
 import sqlite3
 import random
-from typing import List, Dict, Any, Optional
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
+
+# Lightweight row type for callers that only read the fields; one tuple per
+# question instead of an outer dict plus a nested options dict
+Question = namedtuple('Question', 'subject id number text a b c d answer type')
+
+def _question_row(cursor, row) -> Dict[str, Any]:
+    """Row factory building the API's question dict straight from a result row."""
+    return {
+        'id': row[1],
+        'question_number': row[2],
+        'question_text': row[3],
+        'options': {
+            'A': row[4],
+            'B': row[5],
+            'C': row[6],
+            'D': row[7]
+        },
+        'correct_answer': row[8],
+        'question_type': row[9],
+        'subject': row[0]
+    }
+
+def _question_tuple(cursor, row) -> Question:
+    """Row factory returning the result row as a Question tuple."""
+    return Question._make(row)
+
+def _question_id(question) -> int:
+    """Primary key of a question in either row format."""
+    return question.id if isinstance(question, Question) else question['id']
 
 class EdtechQuestionsAPI:
-    def __init__(self, db_path: str = 'edtech_questions_database.db'):
+    TABLE_MAP = {
+        'english': 'english_questions',
+        'mathematics': 'mathematics_questions',
+        'general_knowledge': 'general_knowledge_questions'
+    }
+    
+    # Fixed statement text per subject so sqlite3's statement cache reuses the
+    # prepared plans; id lists are bound as one JSON array parameter
+    _SELECT_BY_IDS_SQL = {
+        subject: f"""
+            SELECT '{subject}' AS subject, id, question_number, question_text, option_a, option_b, 
+                   option_c, option_d, correct_answer, question_type
+            FROM {table_name}
+            WHERE id IN (SELECT value FROM json_each(?))
+        """
+        for subject, table_name in TABLE_MAP.items()
+    }
+    _SELECT_BY_IDS_AND_TYPE_SQL = {
+        subject: sql + " AND question_type = ?" for subject, sql in _SELECT_BY_IDS_SQL.items()
+    }
+    _SELECT_IDS_SQL = {
+        subject: f"SELECT id FROM {table_name}" for subject, table_name in TABLE_MAP.items()
+    }
+    _SELECT_IDS_BY_TYPE_SQL = {
+        subject: sql + " WHERE question_type = ?" for subject, sql in _SELECT_IDS_SQL.items()
+    }
+    
+    # Live id bounds for random sampling, read on every call so rows written
+    # since the API was created are reachable; each subquery is one probe of the
+    # rowid b-tree or of the (question_type, id) index
+    _ID_RANGE_SQL = {
+        subject: f"SELECT (SELECT MIN(id) FROM {table_name}), (SELECT MAX(id) FROM {table_name})"
+        for subject, table_name in TABLE_MAP.items()
+    }
+    _ID_RANGE_BY_TYPE_SQL = {
+        subject: f"""
+            SELECT (SELECT MIN(id) FROM {table_name} WHERE question_type = ?1),
+                   (SELECT MAX(id) FROM {table_name} WHERE question_type = ?1)
+        """
+        for subject, table_name in TABLE_MAP.items()
+    }
+    
+    # One statement for the whole mixed quiz: a recursive counter draws ? random
+    # ids per table inside SQLite and the picks are joined back on the primary key.
+    # MIN(id) and MAX(id) are separate subqueries so each is a single rowid
+    # b-tree probe; together in one SELECT they force a table scan
+    _MIXED_QUIZ_SQL = (
+        "WITH RECURSIVE cnt(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM cnt WHERE x < ?), "
+        + ", ".join(
+            f"""
+            picks_{subject} AS (
+                SELECT DISTINCT bounds.min_id
+                       + (random() & 9223372036854775807) % (bounds.max_id - bounds.min_id + 1) AS id
+                FROM cnt, (SELECT (SELECT MIN(id) FROM {table_name}) AS min_id,
+                                  (SELECT MAX(id) FROM {table_name}) AS max_id) AS bounds
+                WHERE bounds.min_id IS NOT NULL
+            )"""
+            for subject, table_name in TABLE_MAP.items()
+        )
+        + " UNION ALL ".join(
+            f"""
+            SELECT '{subject}' AS subject, q.id, q.question_number, q.question_text, q.option_a, 
+                   q.option_b, q.option_c, q.option_d, q.correct_answer, q.question_type
+            FROM {table_name} q JOIN picks_{subject} p ON q.id = p.id"""
+            for subject, table_name in TABLE_MAP.items()
+        )
+    )
+    
+    def __init__(self, db_path: str = 'edtech_questions_database.db', cache_ttl: float = 300.0):
         self.db_path = db_path
+        
+        # Aggregate results keyed by (method, subject) -> (timestamp, value)
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        
+        # One long-lived connection keeps SQLite's page cache warm across calls
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-64000;
+            PRAGMA mmap_size=268435456;
+        """)
     
+    @contextmanager
     def get_connection(self):
-        """Get database connection."""
-        return sqlite3.connect(self.db_path)
+        """Get the shared database connection, serialized across threads."""
+        with self._lock:
+            yield self._conn
     
-    def get_questions_by_subject(self, subject: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get questions from a specific subject."""
-        table_map = {
-            'english': 'english_questions',
-            'mathematics': 'mathematics_questions', 
-            'general_knowledge': 'general_knowledge_questions'
-        }
+    def _cached(self, key: tuple, compute):
+        """Return a cached aggregate, recomputing it once the TTL expires."""
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is None or now - entry[0] >= self.cache_ttl:
+            entry = (now, compute())
+            self._cache[key] = entry
         
-        if subject.lower() not in table_map:
-            raise ValueError(f"Subject must be one of: {list(table_map.keys())}")
+        # Hand out copies so callers can't mutate the cached value
+        return copy.deepcopy(entry[1])
+    
+    def invalidate_stats(self):
+        """Drop cached statistics; call after writing to the database."""
+        self._cache.clear()
+    
+    def close(self):
+        """Close the shared database connection."""
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+    
+    def _question_cursor(self, conn, row_factory=_question_row):
+        """Get a cursor whose rows come back as question dicts (or tuples)."""
+        cursor = conn.cursor()
+        cursor.row_factory = row_factory
+        return cursor
+    
+    def _fetch_by_ids(self, conn, subject: str, ids: List[int],
+                      question_type: Optional[str] = None, row_factory=_question_row) -> list:
+        """Fetch questions by primary key, optionally filtered by type."""
+        if not ids:
+            return []
+        
+        cursor = self._question_cursor(conn, row_factory)
+        if question_type:
+            cursor.execute(self._SELECT_BY_IDS_AND_TYPE_SQL[subject], (json.dumps(ids), question_type))
+        else:
+            cursor.execute(self._SELECT_BY_IDS_SQL[subject], (json.dumps(ids),))
+        return cursor.fetchall()
+    
+    def _sample_ids(self, conn, subject: str, count: int,
+                    question_type: Optional[str] = None) -> List[int]:
+        """Draw candidate ids from the current id range of a subject table."""
+        if count <= 0:
+            return []
         
-        table_name = table_map[subject.lower()]
+        # Probing the primary key avoids sorting the whole table with ORDER BY RANDOM()
+        if question_type:
+            min_id, max_id = conn.execute(self._ID_RANGE_BY_TYPE_SQL[subject], (question_type,)).fetchone()
+        else:
+            min_id, max_id = conn.execute(self._ID_RANGE_SQL[subject]).fetchone()
+        if min_id is None:
+            return []
         
-        with self.get_connection() as conn:
+        # Oversample to absorb gaps left by deletes or rows of another type
+        population = range(min_id, max_id + 1)
+        return random.sample(population, min(count * 2, len(population)))
+    
+    def _complete_sample(self, conn, subject: str, questions: list, count: int,
+                         question_type: Optional[str] = None, row_factory=_question_row) -> list:
+        """Top up a short sample from the real ids, then shuffle and trim it."""
+        # Sparse ranges and repeated draws can come up short; top up from the real ids
+        if len(questions) < count:
             cursor = conn.cursor()
-            cursor.execute(f"""
-                SELECT id, question_number, question_text, option_a, option_b, 
-                       option_c, option_d, correct_answer, question_type
-                FROM {table_name}
-                ORDER BY RANDOM()
-                LIMIT ?
-            """, (limit,))
-            
-            questions = []
-            for row in cursor.fetchall():
-                questions.append({
-                    'id': row[0],
-                    'question_number': row[1],
-                    'question_text': row[2],
-                    'options': {
-                        'A': row[3],
-                        'B': row[4],
-                        'C': row[5],
-                        'D': row[6]
-                    },
-                    'correct_answer': row[7],
-                    'question_type': row[8],
-                    'subject': subject
-                })
+            if question_type:
+                cursor.execute(self._SELECT_IDS_BY_TYPE_SQL[subject], (question_type,))
+            else:
+                cursor.execute(self._SELECT_IDS_SQL[subject])
             
-            return questions
+            found = {_question_id(question) for question in questions}
+            pool = [row[0] for row in cursor if row[0] not in found]
+            extra = random.sample(pool, min(count - len(questions), len(pool)))
+            questions += self._fetch_by_ids(conn, subject, extra, row_factory=row_factory)
+        
+        random.shuffle(questions)
+        return questions[:count]
+    
+    def _random_questions(self, conn, subject: str, count: int,
+                          question_type: Optional[str] = None, row_factory=_question_row) -> list:
+        """Pick up to `count` random questions using primary key lookups."""
+        question_type = question_type or None
+        
+        # A negative count used to mean no LIMIT: every matching question, shuffled
+        if count < 0:
+            return self._complete_sample(conn, subject, [], sys.maxsize, question_type, row_factory)
+        
+        ids = self._sample_ids(conn, subject, count, question_type)
+        questions = self._fetch_by_ids(conn, subject, ids, question_type, row_factory)
+        return self._complete_sample(conn, subject, questions, count, question_type, row_factory)
+    
+    def get_questions_by_subject(self, subject: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get questions from a specific subject."""
+        if subject.lower() not in self.TABLE_MAP:
+            raise ValueError(f"Subject must be one of: {list(self.TABLE_MAP.keys())}")
+        
+        with self.get_connection() as conn:
+            return self._random_questions(conn, subject.lower(), limit)
+    
+    def iter_questions_by_subject(self, subject: str, limit: int = 10) -> Iterator[Question]:
+        """Return an iterator over random questions from a subject as Question tuples."""
+        if subject.lower() not in self.TABLE_MAP:
+            raise ValueError(f"Subject must be one of: {list(self.TABLE_MAP.keys())}")
+        
+        # A plain method rather than a generator, so a bad subject raises here
+        # and the lock is released before the caller starts iterating
+        with self.get_connection() as conn:
+            questions = self._random_questions(conn, subject.lower(), limit,
+                                               row_factory=_question_tuple)
+        return iter(questions)
     
     def get_quiz_questions(self, subject: str, question_type: Optional[str] = None, 
                           count: int = 10) -> List[Dict[str, Any]]:
         """Generate a quiz with specified parameters."""
-        table_map = {
-            'english': 'english_questions',
-            'mathematics': 'mathematics_questions',
-            'general_knowledge': 'general_knowledge_questions'
-        }
-        
-        table_name = table_map[subject.lower()]
-        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            if question_type:
-                query = f"""
-                    SELECT id, question_number, question_text, option_a, option_b, 
-                           option_c, option_d, correct_answer, question_type
-                    FROM {table_name}
-                    WHERE question_type = ?
-                    ORDER BY RANDOM()
-                    LIMIT ?
-                """
-                cursor.execute(query, (question_type, count))
-            else:
-                query = f"""
-                    SELECT id, question_number, question_text, option_a, option_b, 
-                           option_c, option_d, correct_answer, question_type
-                    FROM {table_name}
-                    ORDER BY RANDOM()
-                    LIMIT ?
-                """
-                cursor.execute(query, (count,))
-            
-            quiz_questions = []
-            for row in cursor.fetchall():
-                quiz_questions.append({
-                    'id': row[0],
-                    'question_number': row[1],
-                    'question_text': row[2],
-                    'options': {
-                        'A': row[3],
-                        'B': row[4],
-                        'C': row[5],
-                        'D': row[6]
-                    },
-                    'correct_answer': row[7],
-                    'question_type': row[8],
-                    'subject': subject
-                })
-            
-            return quiz_questions
+            return self._random_questions(conn, subject.lower(), count, question_type)
     
     def get_mixed_quiz(self, count_per_subject: int = 5) -> List[Dict[str, Any]]:
         """Generate a mixed quiz with questions from all subjects."""
+        if count_per_subject == 0:
+            return []
+        
+        questions_by_subject = {subject: [] for subject in self.TABLE_MAP}
         all_questions = []
         
-        for subject in ['english', 'mathematics', 'general_knowledge']:
-            questions = self.get_questions_by_subject(subject, count_per_subject)
-            all_questions.extend(questions)
+        with self.get_connection() as conn:
+            # A negative count means every question, which the top-up alone covers
+            if count_per_subject < 0:
+                count_per_subject = sys.maxsize
+            else:
+                # Oversample so duplicate draws and id gaps rarely need a top-up
+                cursor = self._question_cursor(conn)
+                cursor.execute(self._MIXED_QUIZ_SQL, (count_per_subject * 2,))
+                for question in cursor:
+                    questions_by_subject[question['subject']].append(question)
+            
+            for subject in self.TABLE_MAP:
+                all_questions.extend(self._complete_sample(conn, subject, questions_by_subject[subject],
+                                                           count_per_subject))
         
         # Shuffle the questions
         random.shuffle(all_questions)
@@ -124,14 +281,12 @@ class EdtechQuestionsAPI:
     
     def get_question_types_by_subject(self, subject: str) -> List[Dict[str, Any]]:
         """Get available question types for a subject."""
-        table_map = {
-            'english': 'english_questions',
-            'mathematics': 'mathematics_questions',
-            'general_knowledge': 'general_knowledge_questions'
-        }
-        
-        table_name = table_map[subject.lower()]
-        
+        table_name = self.TABLE_MAP[subject.lower()]
+        return self._cached(('get_question_types_by_subject', subject.lower()),
+                            lambda: self._query_question_types(table_name))
+    
+    def _query_question_types(self, table_name: str) -> List[Dict[str, Any]]:
+        """Count questions per type in a subject table."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
@@ -145,6 +300,10 @@ class EdtechQuestionsAPI:
     
     def get_database_stats(self) -> Dict[str, Any]:
         """Get overall database statistics."""
+        return self._cached(('get_database_stats', None), self._query_database_stats)
+    
+    def _query_database_stats(self) -> Dict[str, Any]:
+        """Count questions per subject and type across all tables."""
         stats = {'subjects': {}, 'total_questions': 0}
         
         tables = {
@@ -153,27 +312,24 @@ class EdtechQuestionsAPI:
             'General Knowledge': 'general_knowledge_questions'
         }
         
+        for subject in tables:
+            stats['subjects'][subject] = {'total_questions': 0, 'question_types': {}}
+        
+        # One statement covers every table; totals are the sum of the type counts
+        query = " UNION ALL ".join(
+            f"SELECT '{subject}', question_type, COUNT(*) FROM {table_name} GROUP BY question_type"
+            for subject, table_name in tables.items()
+        )
+        
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute(query)
             
-            for subject, table_name in tables.items():
-                # Get total count
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                total = cursor.fetchone()[0]
-                
-                # Get question types
-                cursor.execute(f"""
-                    SELECT question_type, COUNT(*) 
-                    FROM {table_name} 
-                    GROUP BY question_type
-                """)
-                types = dict(cursor.fetchall())
-                
-                stats['subjects'][subject] = {
-                    'total_questions': total,
-                    'question_types': types
-                }
-                stats['total_questions'] += total
+            for subject, question_type, count in cursor:
+                subject_stats = stats['subjects'][subject]
+                subject_stats['question_types'][question_type] = count
+                subject_stats['total_questions'] += count
+                stats['total_questions'] += count
         
         return stats
 
@@ -193,12 +349,13 @@ def demo_api_usage():
     
     # Demo 2: Get English questions
     print("\n🇬🇧 Sample English Questions:")
-    english_questions = api.get_questions_by_subject('english', 2)
-    for i, q in enumerate(english_questions, 1):
-        print(f"\n{i}. [{q['question_type']}] {q['question_text']}")
-        for option, text in q['options'].items():
-            print(f"   {option}) {text}")
-        print(f"   ✅ Answer: {q['correct_answer']}")
+    for i, q in enumerate(api.iter_questions_by_subject('english', 2), 1):
+        print(f"\n{i}. [{q.type}] {q.text}")
+        print(f"   A) {q.a}")
+        print(f"   B) {q.b}")
+        print(f"   C) {q.c}")
+        print(f"   D) {q.d}")
+        print(f"   ✅ Answer: {q.answer}")
     
     # Demo 3: Get Mathematics arithmetic questions
     print("\n🔢 Mathematics Arithmetic Questions:")
@@ -227,6 +384,8 @@ def demo_api_usage():
         for type_info in types:
             print(f"  • {type_info['type']}: {type_info['count']} questions")
     
+    api.close()
+    
     print("\n" + "=" * 60)
     print("✅ API Demo Complete! Database is ready for integration.")
 
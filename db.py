@@ -0,0 +1,79 @@
+"""
+Shared SQLite connections and input helpers for the extraction and summary scripts
+Keeps one tuned connection per database file so SQLite's page cache stays warm across calls
+"""
+
+import atexit
+import mmap
+import os
+import re
+import sqlite3
+
+DEFAULT_DB_PATH = 'edtech_questions_database.db'
+
+SUBJECTS = ['english', 'mathematics', 'general_knowledge']
+
+# (question_type, id) serves type filters, GROUP BY question_type and
+# random id sampling within a type without touching the table rows
+QTYPE_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_{subject}_qtype_id
+    ON {subject}_questions(question_type, id)
+'''
+
+# db_path -> open connection
+_connections = {}
+
+def get_conn(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Return the shared connection for db_path, opening it on first use."""
+    conn = _connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-50000;
+            PRAGMA temp_store=MEMORY;
+        """)
+        ensure_indexes(conn)
+        _connections[db_path] = conn
+    return conn
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """Create the question_type indexes on whichever subject tables exist."""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    
+    for subject in SUBJECTS:
+        if f'{subject}_questions' in existing:
+            conn.execute(QTYPE_INDEX_SQL.format(subject=subject))
+    conn.commit()
+
+def close_all():
+    """Close every shared connection."""
+    while _connections:
+        _, conn = _connections.popitem()
+        conn.close()
+
+atexit.register(close_all)
+
+def read_text(text_file_path: str) -> str:
+    """Read a UTF-8 text file through a read-only memory map."""
+    with open(text_file_path, 'rb') as file:
+        # Empty files cannot be mapped
+        if os.fstat(file.fileno()).st_size == 0:
+            return ''
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            content = str(mapped, 'utf-8')
+    
+    # Match text mode's universal newlines
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+def compile_keywords(category_keywords):
+    """Compile (category, keywords) pairs into one substring regex per category, in order."""
+    # Plain alternation of escaped keywords matches exactly where the old
+    # `word in text` checks did, including inside longer words
+    return [
+        (re.compile('|'.join(map(re.escape, keywords))), category)
+        for category, keywords in category_keywords
+    ]
@@ -7,23 +7,80 @@ Extracts questions from English bank PDF text and stores them in SQLite database
 import re
 import sqlite3
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Question type keywords in priority order (earlier entries win), matched
+# against the lowercased question text
+TYPE_KEYWORDS = [
+    ('grammatical name', 'grammar'),
+    ('grammar', 'grammar'),
+    ('sound', 'pronunciation'),
+    ('pronunciation', 'pronunciation'),
+    ('meaning', 'vocabulary'),
+    ('choose the option', 'multiple_choice'),
+]
+
+# Literal blanks marking a fill-in-the-blank question, matched case-sensitively
+BLANK_MARKERS = ('-' * 10, '_' * 3)
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+# Same rules as EnglishQuestionExtractor.determine_question_type, applied in one
+# pass inside SQLite to rows saved without a type
+CLASSIFY_QUESTIONS_SQL = '''
+    UPDATE english_questions SET question_type = CASE
+{}
+        ELSE 'general'
+    END
+    WHERE question_type IS NULL
+'''.format('\n'.join(
+    [f"        WHEN instr(lower(question_text), {_sql_literal(keyword)}) > 0 THEN {_sql_literal(question_type)}"
+     for keyword, question_type in TYPE_KEYWORDS]
+    + [f"        WHEN instr(question_text, {_sql_literal(marker)}) > 0 THEN 'fill_in_blank'"
+       for marker in BLANK_MARKERS]
+))
+
 class EnglishQuestionExtractor:
+    # Standalone answer marks and the informational line that precedes the questions
+    _CHECKMARKS = frozenset({'✅', '✔'})
+    _SKIP_TEXT = 'Here are the questions'
+    
     def __init__(self, db_path: str = "english_questions.db"):
         self.db_path = db_path
         
         # Regex patterns based on document analysis
         self.QUESTION_PATTERN = r'^(\*?\d+\.\*|By\*\d+\.\*|Question\s+\d+:)\s*(.*)$'
         self.OPTION_PATTERN = r'^[\*\-\s]*([A-Z])\)\s*(.*?)\s*([✔✅])?$'
-        self.SIMPLE_OPTION_PATTERN = r'^\*?\s*([A-Z])\)\s*(.*?)\s*([✔✅])?$'
         self.STAR_OPTION_PATTERN = r'^\*\s*(.*?)\s*([✔✅])?$'
         self.PAGE_PATTERN = r'===== Page \d+ ====='
         
+        # Compile once; OPTION_PATTERN already covers the "*A) text" form
+        self._q_re = re.compile(self.QUESTION_PATTERN)
+        self._opt_re = re.compile(self.OPTION_PATTERN)
+        self._star_re = re.compile(self.STAR_OPTION_PATTERN)
+        self._num_re = re.compile(r'\d+')
+        self._opt_prefix_re = re.compile(r'^[A-Z]\)')
+        self._page_re = re.compile(self.PAGE_PATTERN)
+        
+        # A whole well-formed question (header line followed by A-D option
+        # lines) over stripped, newline-joined lines; [^\S\n] is \s within a line
+        option_line = r'(?:[\*\-]|[^\S\n])*{}\)[^\S\n]*(.*?)[^\S\n]*([✔✅])?'
+        self.RECORD_PATTERN = (
+            r'(\*?\d+\.\*|By\*\d+\.\*|Question[^\S\n]+\d+:)[^\S\n]*(.*)\n'
+            + r'\n'.join(option_line.format(letter) for letter in 'ABCD')
+            + r'(?:\n|\Z)'
+        )
+        self._record_re = re.compile(self.RECORD_PATTERN)
+        
+        # Question type keywords and blank markers shared with CLASSIFY_QUESTIONS_SQL
+        self.TYPE_KEYWORDS = TYPE_KEYWORDS
+        self._blank_re = re.compile('|'.join(map(re.escape, BLANK_MARKERS)))
+        
     def create_database(self):
         """Create the SQLite database and questions table"""
         conn = sqlite3.connect(self.db_path)
@@ -44,6 +101,18 @@ class EnglishQuestionExtractor:
             )
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_english_qtype_id
+            ON english_questions(question_type, id)
+        ''')
+        
+        # Expression index so ORDER BY CAST(question_number AS INTEGER) LIMIT n
+        # in print_sample_questions reads n index entries instead of sorting
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_english_qnum_int
+            ON english_questions(CAST(question_number AS INTEGER))
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info(f"Database created at {self.db_path}")
@@ -51,72 +120,156 @@ class EnglishQuestionExtractor:
     def clean_text(self, text: str) -> str:
         """Clean text by removing extra whitespace and formatting characters"""
         # Remove asterisks around text (e.g., "*bite off*" → "bite off")
-        if text.startswith('*') and text.endswith('*') and len(text) > 2:
+        if len(text) > 2 and text[0] == '*' and text[-1] == '*':
             text = text[1:-1]
         
         # Remove backticks
-        text = text.replace('```', '')
+        if '```' in text:
+            text = text.replace('```', '')
         
-        # Clean up extra whitespace
-        text = ' '.join(text.split())
+        # Most lines are already clean: printable text holds no whitespace
+        # except plain spaces, so only doubled spaces would need collapsing
+        if text.isprintable() and '  ' not in text:
+            return text.strip()
         
-        return text.strip()
+        # Clean up extra whitespace
+        return ' '.join(text.split())
     
     def extract_question_number(self, question_pattern_match: str) -> str:
         """Extract just the numeric part from question pattern"""
         # Extract digits from patterns like "2292.*", "By*2293.*", "*1153.*", "Question 1098:"
-        number_match = re.search(r'\d+', question_pattern_match)
+        number_match = self._num_re.search(question_pattern_match)
         return number_match.group() if number_match else ""
     
     def determine_question_type(self, question_text: str) -> str:
         """Determine the type of question based on content"""
         question_lower = question_text.lower()
         
-        if 'grammatical name' in question_lower or 'grammar' in question_lower:
-            return 'grammar'
-        elif 'sound' in question_lower or 'pronunciation' in question_lower:
-            return 'pronunciation'
-        elif 'meaning' in question_lower or 'nearest meaning' in question_lower:
-            return 'vocabulary'
-        elif 'choose the option' in question_lower:
-            return 'multiple_choice'
-        elif '----------' in question_text or '___' in question_text:
+        # Keywords are in priority order, so the first hit decides the type
+        for keyword, question_type in self.TYPE_KEYWORDS:
+            if keyword in question_lower:
+                return question_type
+        
+        if self._blank_re.search(question_text):
             return 'fill_in_blank'
-        else:
-            return 'general'
+        return 'general'
     
-    def parse_questions(self, content: str) -> List[Dict]:
-        """Parse questions from the extracted PDF text"""
-        # Split by pages if page markers exist, otherwise process as single block
-        if self.PAGE_PATTERN in content:
-            pages = re.split(self.PAGE_PATTERN, content)[1:]  # Skip first empty split
-        else:
-            pages = [content]
+    def _iter_pages(self, f: Iterable[str]) -> Iterator[List[str]]:
+        """Yield the lines of each page, reading the file one line at a time"""
+        page = []
+        for line in f:
+            marker = self._page_re.search(line)
+            while marker:
+                page.extend(line[:marker.start()].splitlines())
+                if any(page_line.strip() for page_line in page):
+                    yield page
+                page = []
+                line = line[marker.end():]
+                marker = self._page_re.search(line)
+            page.extend(line.splitlines())
+        
+        if any(page_line.strip() for page_line in page):
+            yield page
+    
+    def _parse_page_fast(self, lines: List[str], page_num: int) -> Optional[List[Dict]]:
+        """Parse a page made only of well-formed questions with one regex sweep.
+        
+        Returns None when any line falls outside RECORD_PATTERN (checkmark
+        lines, star options, continuation text, ...) so the caller can use
+        the line-by-line parser, which gives the same result for clean pages.
+        """
+        text = '\n'.join(line for line in (raw.strip() for raw in lines) if line)
+        if not text or self._SKIP_TEXT in text:
+            return None
         
         questions = []
+        pos = 0
+        while pos < len(text):
+            match = self._record_re.match(text, pos)
+            if not match:
+                return None
+            pos = match.end()
+            
+            question = {
+                'number': self.extract_question_number(match.group(1)),
+                'text': self.clean_text(match.group(2)),
+                'options': {},
+                'correct_answer': None,
+                'page': page_num
+            }
+            for index, letter in enumerate('ABCD'):
+                raw_text = match.group(3 + 2 * index)
+                question['options'][letter] = self.clean_text(raw_text)
+                
+                stripped = raw_text.strip()
+                if match.group(4 + 2 * index) or (stripped.startswith('*') and stripped.endswith('*')):
+                    question['correct_answer'] = letter
+            
+            logger.debug("Found question %s: %.50s...", question['number'], question['text'])
+            questions.append(question)
         
-        for page_num, page in enumerate(pages, 1):
-            lines = page.splitlines()
-            current_question = None
-            pending_checkmark = False
+        return questions
+    
+    def parse_questions(self, pages: Iterable[List[str]]) -> List[Dict]:
+        """Parse questions from pages of extracted PDF text lines"""
+        return list(self.iter_questions(pages))
+    
+    def iter_questions(self, pages: Iterable[List[str]]) -> Iterator[Dict]:
+        """Yield complete questions from pages of extracted PDF text lines"""
+        question_count = 0
+        page_count = 0
+        
+        # Parser state carries across page breaks: a question whose options or
+        # text run onto the next page is only finalized at the next question
+        # header or at the end of the input
+        current_question = None
+        pending_checkmark = False
+        
+        for page_num, lines in enumerate(pages, 1):
+            page_count = page_num
+            
+            # Clean pages go through the C regex engine in one sweep. A clean
+            # page starts with a header, which closes any question left open by
+            # the previous page; its own last question stays open in turn
+            page_questions = None if pending_checkmark else self._parse_page_fast(lines, page_num)
+            if page_questions is not None:
+                *page_questions, last_question = page_questions
+                if current_question:
+                    page_questions.insert(0, current_question)
+                for question in page_questions:
+                    if self._finalize_question(question):
+                        question_count += 1
+                        yield question
+                
+                last_question['option_order'] = list('ABCD')
+                last_question['text_parts'] = []
+                current_question = last_question
+                continue
             
             for line_num, line in enumerate(lines):
                 original_line = line
                 line = line.strip()
                 
                 # Skip empty lines and informational text
-                if not line or line in ['✅', '✔'] or 'Here are the questions' in line:
+                if not line or line in self._CHECKMARKS or self._SKIP_TEXT in line:
                     # Check if this is a standalone checkmark for the previous option
-                    if line in ['✅', '✔'] and current_question and current_question['options']:
+                    if line in self._CHECKMARKS and current_question and current_question['options']:
                         pending_checkmark = True
                     continue
                 
+                # Each pattern can only match lines with particular first characters,
+                # so dispatch on line[0] and skip regexes that cannot match
+                first = line[0]
+                
                 # Try to match question number pattern
-                question_match = re.match(self.QUESTION_PATTERN, line)
+                question_match = None
+                if first == '*' or first == 'B' or first == 'Q' or first.isdigit():
+                    question_match = self._q_re.match(line)
                 if question_match:
                     # Save previous question if exists
-                    if current_question:
-                        self._finalize_question(current_question, questions)
+                    if current_question and self._finalize_question(current_question):
+                        question_count += 1
+                        yield current_question
                     
                     # Start new question
                     number = self.extract_question_number(question_match.group(1))
@@ -128,21 +281,22 @@ class EnglishQuestionExtractor:
                         'options': {},
                         'correct_answer': None,
                         'page': page_num,
-                        'option_order': []  # Track order of options
+                        'option_order': [],  # Track order of options
+                        'text_parts': []  # Continuation lines, joined on finalize
                     }
                     
-                    logger.debug(f"Found question {number}: {text[:50]}...")
+                    logger.debug("Found question %s: %.50s...", number, text)
                     continue
                 
                 # Try to match option pattern
-                option_match = re.match(self.OPTION_PATTERN, line)
-                if not option_match:
-                    option_match = re.match(self.SIMPLE_OPTION_PATTERN, line)
+                option_match = None
+                if first == '*' or first == '-' or 'A' <= first <= 'Z':
+                    option_match = self._opt_re.match(line)
                 
                 # Handle star-format options (like "* similar")
                 star_match = None
-                if not option_match:
-                    star_match = re.match(self.STAR_OPTION_PATTERN, line)
+                if not option_match and first == '*':
+                    star_match = self._star_re.match(line)
                 
                 if (option_match or star_match) and current_question:
                     if option_match:
@@ -168,7 +322,7 @@ class EnglishQuestionExtractor:
                     if pending_checkmark and not has_checkmark and len(current_question['option_order']) > 0:
                         last_option = current_question['option_order'][-1]
                         current_question['correct_answer'] = last_option
-                        logger.debug(f"  Applied pending checkmark to option {last_option}")
+                        logger.debug("  Applied pending checkmark to option %s", last_option)
                         pending_checkmark = False
                     
                     is_correct = has_checkmark or is_correct_asterisk
@@ -178,41 +332,47 @@ class EnglishQuestionExtractor:
                     
                     if is_correct:
                         current_question['correct_answer'] = letter
-                        logger.debug(f"  Correct answer: {letter}) {option_text}")
+                        logger.debug("  Correct answer: %s) %s", letter, option_text)
                     
                     continue
                 
                 # Check for standalone checkmark after option processing
-                if line in ['✅', '✔'] and current_question and current_question['option_order']:
+                if line in self._CHECKMARKS and current_question and current_question['option_order']:
                     if not current_question['correct_answer']:
                         last_option = current_question['option_order'][-1]
                         current_question['correct_answer'] = last_option
-                        logger.debug(f"  Applied standalone checkmark to option {last_option}")
+                        logger.debug("  Applied standalone checkmark to option %s", last_option)
                     continue
                 
                 # If line doesn't match question or option pattern, it might be continuation text
                 if current_question and current_question['text']:
                     # Check if this looks like continuation of question text
-                    if not re.match(r'^[A-Z]\)', line) and len(line) > 10 and 'question' not in line.lower():
-                        current_question['text'] += ' ' + self.clean_text(line)
-            
-            # Don't forget the last question in the page
-            if current_question:
-                self._finalize_question(current_question, questions)
+                    if not self._opt_prefix_re.match(line) and len(line) > 10 and 'question' not in line.lower():
+                        current_question['text_parts'].append(self.clean_text(line))
         
-        logger.info(f"Extracted {len(questions)} questions from {len(pages)} pages")
-        return questions
+        # Don't forget the last question
+        if current_question and self._finalize_question(current_question):
+            question_count += 1
+            yield current_question
+        
+        logger.info(f"Extracted {question_count} questions from {page_count} pages")
     
-    def _finalize_question(self, question: Dict, questions: List[Dict]):
-        """Finalize and add question to list if complete"""
+    def _finalize_question(self, question: Dict) -> bool:
+        """Finalize a question and report whether it is complete"""
         # Clean up the question dict by removing helper fields
         if 'option_order' in question:
             del question['option_order']
         
+        # Join continuation lines onto the question text in one go
+        text_parts = question.pop('text_parts', None)
+        if text_parts:
+            question['text'] = ' '.join([question['text'], *text_parts])
+        
         if self.is_question_complete(question):
-            questions.append(question)
-        else:
-            logger.warning(f"Discarding incomplete question {question['number']}")
+            return True
+        
+        logger.warning(f"Discarding incomplete question {question['number']}")
+        return False
     
     def is_question_complete(self, question: Dict) -> bool:
         """Check if a question has all required components"""
@@ -229,68 +389,75 @@ class EnglishQuestionExtractor:
         
         return has_all_options and has_correct_answer and has_text
     
-    def save_to_database(self, questions: List[Dict]):
-        """Save extracted questions to SQLite database"""
+    def save_to_database(self, questions: Iterable[Dict]):
+        """Save complete questions (e.g. from iter_questions) to SQLite database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Clear existing data
-        cursor.execute('DELETE FROM english_questions')
+        # Bulk load settings; synchronous is per-connection and ends with it
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=OFF')
+        
+        rows = (
+            (
+                question['number'],
+                question['text'],
+                question['options'].get('A', ''),
+                question['options'].get('B', ''),
+                question['options'].get('C', ''),
+                question['options'].get('D', ''),
+                question['correct_answer']
+            )
+            for question in questions
+        )
         
         saved_count = 0
-        for question in questions:
-            if not self.is_question_complete(question):
-                logger.warning(f"Skipping incomplete question {question['number']}")
-                continue
+        try:
+            cursor.execute('BEGIN')
             
-            question_type = self.determine_question_type(question['text'])
+            # Clear existing data
+            cursor.execute('DELETE FROM english_questions')
             
-            try:
-                cursor.execute('''
-                    INSERT INTO english_questions 
-                    (question_number, question_text, option_a, option_b, option_c, option_d, 
-                     correct_answer, question_type)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    question['number'],
-                    question['text'],
-                    question['options'].get('A', ''),
-                    question['options'].get('B', ''),
-                    question['options'].get('C', ''),
-                    question['options'].get('D', ''),
-                    question['correct_answer'],
-                    question_type
-                ))
-                saved_count += 1
-            except Exception as e:
-                logger.error(f"Error saving question {question['number']}: {e}")
-        
-        conn.commit()
-        conn.close()
+            cursor.executemany('''
+                INSERT INTO english_questions 
+                (question_number, question_text, option_a, option_b, option_c, option_d, 
+                 correct_answer)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            saved_count = cursor.rowcount
+            
+            # Classify the whole batch in SQL rather than per row in Python
+            cursor.execute(CLASSIFY_QUESTIONS_SQL)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Error saving questions: {e}")
+        finally:
+            conn.close()
         
         logger.info(f"Saved {saved_count} questions to database")
         return saved_count
     
+    def extract_questions(self, text_file_path: str) -> List[Dict]:
+        """Extract complete questions from a text file without saving them"""
+        with open(text_file_path, 'r', encoding='utf-8') as f:
+            return self.parse_questions(self._iter_pages(f))
+    
     def extract_and_save(self, text_file_path: str):
         """Main method to extract questions from text file and save to database"""
         logger.info(f"Starting extraction from {text_file_path}")
         
-        # Read the extracted text
-        with open(text_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
         # Create database
         self.create_database()
         
-        # Parse questions
-        questions = self.parse_questions(content)
-        
-        # Save to database
-        saved_count = self.save_to_database(questions)
+        # Parse questions page by page as the file is read, feeding them
+        # straight into the database insert
+        with open(text_file_path, 'r', encoding='utf-8') as f:
+            saved_count = self.save_to_database(self.iter_questions(self._iter_pages(f)))
         
         logger.info(f"Extraction complete! {saved_count} questions saved to {self.db_path}")
         
-        return questions, saved_count
+        return saved_count
     
     def print_sample_questions(self, limit: int = 3):
         """Print a few sample questions from the database for verification"""
@@ -325,7 +492,7 @@ def main():
     extractor = EnglishQuestionExtractor()
     
     # Extract questions from the complete text file
-    questions, saved_count = extractor.extract_and_save('english_bank_complete.txt')
+    saved_count = extractor.extract_and_save('english_bank_complete.txt')
     
     # Print some sample questions for verification
     extractor.print_sample_questions(3)
@@ -1,11 +1,33 @@
-import sqlite3
+import sys
 import json
 from datetime import datetime
 
+from db import get_conn
+
+try:
+    import orjson  # optional: faster JSON export
+except ImportError:
+    orjson = None
+
+# Subject -> (table, source document, potential questions found in the source)
+SUBJECTS = {
+    'English': ('english_questions', 'English bank PDF (74 pages)', '204 potential questions (50%)'),
+    'Mathematics': ('mathematics_questions', 'Mathematics bank PDF (8 pages)', '188 potential questions (77.7%)'),
+    'General Knowledge': ('general_knowledge_questions', 'General Knowledge PDF', '62 potential questions (83.9%)')
+}
+
+# One statement for every subject; the position column keeps subjects in
+# SUBJECTS order with each subject's types by descending count (ties broken
+# the way the per-table sort used to order them)
+SUMMARY_SQL = " UNION ALL ".join(
+    f"SELECT {position}, '{subject}', question_type, COUNT(*) FROM {table} GROUP BY question_type"
+    for position, (subject, (table, _, _)) in enumerate(SUBJECTS.items())
+) + " ORDER BY 1, 4 DESC, 3 DESC"
+
 def generate_database_summary():
     """Generate a comprehensive summary of the edtech questions database."""
     
-    conn = sqlite3.connect('edtech_questions_database.db')
+    conn = get_conn()
     cursor = conn.cursor()
     
     summary = {
@@ -15,78 +37,40 @@ def generate_database_summary():
         'subjects': {}
     }
     
-    # Get English questions statistics
-    cursor.execute("SELECT COUNT(*) FROM english_questions")
-    english_count = cursor.fetchone()[0]
-    
-    cursor.execute("""
-        SELECT question_type, COUNT(*) 
-        FROM english_questions 
-        GROUP BY question_type 
-        ORDER BY COUNT(*) DESC
-    """)
-    english_types = dict(cursor.fetchall())
-    
-    summary['subjects']['English'] = {
-        'total_questions': english_count,
-        'question_types': english_types,
-        'source': 'English bank PDF (74 pages)',
-        'extraction_rate': f"{english_count}/204 potential questions (50%)"
-    }
-    
-    # Get Mathematics questions statistics
-    cursor.execute("SELECT COUNT(*) FROM mathematics_questions")
-    math_count = cursor.fetchone()[0]
-    
-    cursor.execute("""
-        SELECT question_type, COUNT(*) 
-        FROM mathematics_questions 
-        GROUP BY question_type 
-        ORDER BY COUNT(*) DESC
-    """)
-    math_types = dict(cursor.fetchall())
-    
-    summary['subjects']['Mathematics'] = {
-        'total_questions': math_count,
-        'question_types': math_types,
-        'source': 'Mathematics bank PDF (8 pages)',
-        'extraction_rate': f"{math_count}/188 potential questions (77.7%)"
-    }
-    
-    # Get General Knowledge questions statistics
-    cursor.execute("SELECT COUNT(*) FROM general_knowledge_questions")
-    gk_count = cursor.fetchone()[0]
-    
-    cursor.execute("""
-        SELECT question_type, COUNT(*) 
-        FROM general_knowledge_questions 
-        GROUP BY question_type 
-        ORDER BY COUNT(*) DESC
-    """)
-    gk_types = dict(cursor.fetchall())
-    
-    summary['subjects']['General Knowledge'] = {
-        'total_questions': gk_count,
-        'question_types': gk_types,
-        'source': 'General Knowledge PDF',
-        'extraction_rate': f"{gk_count}/62 potential questions (83.9%)"
-    }
-    
-    summary['total_questions'] = english_count + math_count + gk_count
+    for subject, (_, source, _) in SUBJECTS.items():
+        summary['subjects'][subject] = {
+            'total_questions': 0,
+            'question_types': {},
+            'source': source,
+            'extraction_rate': None
+        }
+    
+    # Per-subject totals are the sums of the type counts
+    cursor.execute(SUMMARY_SQL)
+    for _, subject, question_type, count in cursor:
+        subject_summary = summary['subjects'][subject]
+        subject_summary['question_types'][question_type] = count
+        subject_summary['total_questions'] += count
+        summary['total_questions'] += count
+    
+    for subject, (_, _, potential) in SUBJECTS.items():
+        subject_summary = summary['subjects'][subject]
+        subject_summary['extraction_rate'] = f"{subject_summary['total_questions']}/{potential}"
     
-    conn.close()
     return summary
 
 def print_formatted_summary(summary):
     """Print a beautifully formatted summary."""
     
-    print("=" * 80)
-    print("🎓 EDTECH QUESTIONS DATABASE - FINAL SUMMARY")
-    print("=" * 80)
-    print(f"📅 Generated: {summary['created_date'][:19]}")
-    print(f"💾 Database: {summary['database_name']}")
-    print(f"📊 Total Questions: {summary['total_questions']}")
-    print("=" * 80)
+    # Build the whole report and write it to stdout in one call
+    out = []
+    out.append("=" * 80)
+    out.append("🎓 EDTECH QUESTIONS DATABASE - FINAL SUMMARY")
+    out.append("=" * 80)
+    out.append(f"📅 Generated: {summary['created_date'][:19]}")
+    out.append(f"💾 Database: {summary['database_name']}")
+    out.append(f"📊 Total Questions: {summary['total_questions']}")
+    out.append("=" * 80)
     
     for subject, data in summary['subjects'].items():
         if subject == 'English':
@@ -96,26 +80,28 @@ def print_formatted_summary(summary):
         else:
             emoji = "🌍"
             
-        print(f"\n{emoji} {subject.upper()}")
-        print("-" * 50)
-        print(f"📈 Total Questions: {data['total_questions']}")
-        print(f"📚 Source: {data['source']}")
-        print(f"⚡ Extraction Rate: {data['extraction_rate']}")
-        print("📋 Question Types:")
+        out.append(f"\n{emoji} {subject.upper()}")
+        out.append("-" * 50)
+        out.append(f"📈 Total Questions: {data['total_questions']}")
+        out.append(f"📚 Source: {data['source']}")
+        out.append(f"⚡ Extraction Rate: {data['extraction_rate']}")
+        out.append("📋 Question Types:")
         
         for q_type, count in data['question_types'].items():
             percentage = (count / data['total_questions']) * 100
-            print(f"   • {q_type}: {count} questions ({percentage:.1f}%)")
+            out.append(f"   • {q_type}: {count} questions ({percentage:.1f}%)")
     
-    print("\n" + "=" * 80)
-    print("✅ DATABASE CREATION COMPLETE!")
-    print("🚀 Ready for production use in edtech platform")
-    print("=" * 80)
+    out.append("\n" + "=" * 80)
+    out.append("✅ DATABASE CREATION COMPLETE!")
+    out.append("🚀 Ready for production use in edtech platform")
+    out.append("=" * 80)
+    
+    sys.stdout.write('\n'.join(out) + '\n')
 
 def export_sample_questions():
     """Export sample questions from each subject for demonstration."""
     
-    conn = sqlite3.connect('edtech_questions_database.db')
+    conn = get_conn()
     cursor = conn.cursor()
     
     samples = {}
@@ -144,8 +130,6 @@ def export_sample_questions():
     """)
     samples['General Knowledge'] = cursor.fetchall()
     
-    conn.close()
-    
     print("\n🎯 SAMPLE QUESTIONS FROM EACH SUBJECT")
     print("=" * 80)
     
@@ -171,8 +155,13 @@ def export_sample_questions():
 def save_summary_to_json(summary):
     """Save the summary to a JSON file for API consumption."""
     
-    with open('database_summary.json', 'w', encoding='utf-8') as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        # orjson emits UTF-8 bytes; NON_STR_KEYS covers a NULL question_type key
+        with open('database_summary.json', 'wb') as f:
+            f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open('database_summary.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
     
     print("\n💾 Summary exported to 'database_summary.json'")
 
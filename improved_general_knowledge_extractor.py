@@ -1,195 +1,178 @@
 import re
 import sqlite3
 import logging
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from db import DEFAULT_DB_PATH, compile_keywords, get_conn, read_text
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Extracted question, fields in the column order of the INSERT
+Question = namedtuple('Question', 'number text a b c d correct qtype difficulty')
+
+# Numbered question lines ("12. Which ...")
+_NUM_Q_RE = re.compile(r'^(\d+)\.\s*(.+)')
+_NUM_PREFIX_RE = re.compile(r'^\d+\.\s*')
+
+# Category keywords, checked in order; a keyword may sit inside a longer
+# word ('day' in 'today')
+CATEGORY_KEYWORDS = [
+    ('Nigerian Geography/Politics', ['nigeria', 'nigerian', 'lagos', 'abuja', 'state', 'capital', 'warri', 'ondo', 'ekiti', 'jigawa']),
+    ('World Geography', ['mountain', 'ocean', 'country', 'continent', 'capital', 'river', 'kilmanjaro', 'everest', 'tanzania']),
+    ('Sports', ['cup', 'olympics', 'sport', 'football', 'soccer', 'fifa', 'goal', 'score']),
+    ('History/Technology', ['founded', 'inventor', 'discovered', 'history', 'century', 'tiktok', 'spacex']),
+    ('Science', ['colour', 'color', 'science', 'chemical', 'element', 'primary colours', 'water']),
+    ('Language/Idioms', ['idiom', 'saying', 'expression', 'phrase', 'apple of', 'feather in', 'chip of']),
+    ('Culture/Events', ['day', 'celebrated', 'holiday', 'festival', "woman's day"]),
+    ('Professions', ['astronomer', 'astrologer', 'surveyor', 'connoisseur', 'horticulturist']),
+]
+_CATEGORY_RES = compile_keywords(CATEGORY_KEYWORDS)
+
 def extract_general_knowledge_questions(text_file_path):
     """Extract general knowledge questions from the converted text file."""
     logger.info(f"Starting general knowledge extraction from {text_file_path}")
     
-    with open(text_file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
+    content = read_text(text_file_path)
     
     # Clean up content first
-    content = re.sub(r'\n+', '\n', content)  # Remove multiple newlines
     content = content.replace('●​', '●')  # Clean up bullet points
     
-    # Find all question blocks using a more flexible approach
-    # Look for numbered questions followed by bullet point options
+    # Find all question blocks in a single pass: numbered questions followed by
+    # bullet point options, or failing that, question-like lines with options
     questions = []
+    unnumbered = []
+    
+    # Split content into lines and process sequentially; dropping empty
+    # lines collapses runs of newlines without a regex pass
+    lines = [line for line in content.split('\n') if line]
     
-    # Split content into lines and process sequentially
-    lines = content.split('\n')
+    # Strip every line once up front; the loops below index into these
+    stripped = [line.strip() for line in lines]
+    is_bullet = [line.startswith('●') for line in stripped]
     i = 0
     
     while i < len(lines):
-        line = lines[i].strip()
+        line = stripped[i]
         
-        # Check if this line starts with a number followed by a dot
-        question_match = re.match(r'^(\d+)\.\s*(.+)', line)
+        # Check if this line starts with a number followed by a dot; only
+        # lines starting with a digit can match, so skip the regex otherwise
+        question_match = _NUM_Q_RE.match(line) if line[:1].isdigit() else None
         if question_match:
             question_num = question_match.group(1)
-            question_text = question_match.group(2).strip()
+            parts = [question_match.group(2).strip()]
             
             # Collect the full question text (it might span multiple lines)
             i += 1
-            while i < len(lines) and not lines[i].strip().startswith('●'):
-                if lines[i].strip() and not re.match(r'^\d+\.\s*', lines[i].strip()):
-                    question_text += ' ' + lines[i].strip()
+            while i < len(lines) and not is_bullet[i]:
+                if stripped[i] and not (stripped[i][0].isdigit() and _NUM_PREFIX_RE.match(stripped[i])):
+                    parts.append(stripped[i])
                 i += 1
+            question_text = ' '.join(parts)
             
-            # Now collect the options
-            options = []
-            while i < len(lines) and lines[i].strip().startswith('●'):
-                option_text = lines[i].strip().replace('●', '').strip()
-                if option_text:
-                    options.append(option_text)
-                i += 1
+            options, i = _collect_options(stripped, is_bullet, i)
             
             # Process this question if we have enough options
             if len(question_text) >= 10 and len(options) >= 2:
-                # Ensure we have exactly 4 options
-                while len(options) < 4:
-                    options.append("")
-                
-                question_type = determine_question_type(question_text)
-                
-                question_data = {
-                    'question_number': f"GK_{int(question_num):03d}",
-                    'question_text': question_text,
-                    'option_a': options[0] if len(options) > 0 else "",
-                    'option_b': options[1] if len(options) > 1 else "",
-                    'option_c': options[2] if len(options) > 2 else "",
-                    'option_d': options[3] if len(options) > 3 else "",
-                    'correct_answer': 'A',  # Default to A since we don't have clear indicators
-                    'question_type': question_type,
-                    'difficulty': 'Medium'
-                }
-                
-                questions.append(question_data)
+                questions.append(_make_question(f"GK_{int(question_num):03d}", question_text, options))
                 logger.debug(f"Extracted question {question_num}: {question_text[:50]}...")
             else:
                 logger.warning(f"Skipped question {question_num}: insufficient text or options")
-        else:
-            i += 1
-    
-    # Also try to find questions without numbers but with clear question structure
-    # Look for lines ending with question marks followed by bullet points
-    additional_questions = []
-    lines = content.split('\n')
-    i = 0
-    question_counter = len(questions) + 1
-    
-    while i < len(lines):
-        line = lines[i].strip()
         
-        # Look for question-like patterns
-        if (line.endswith('?') or 
-            line.endswith('is') or 
-            line.endswith('are') or
-            ('where' in line.lower() and not line.startswith('●')) or
-            ('what' in line.lower() and not line.startswith('●')) or
-            ('which' in line.lower() and not line.startswith('●'))):
+        # Also accept questions without numbers but with clear question structure
+        elif (line.endswith('?') or 
+              line.endswith('is') or 
+              line.endswith('are') or
+              ('where' in line.lower() and not line.startswith('●')) or
+              ('what' in line.lower() and not line.startswith('●')) or
+              ('which' in line.lower() and not line.startswith('●'))):
             
             question_text = line
-            i += 1
             
             # Check if followed by options
-            options = []
-            while i < len(lines) and lines[i].strip().startswith('●'):
-                option_text = lines[i].strip().replace('●', '').strip()
-                if option_text:
-                    options.append(option_text)
-                i += 1
+            options, i = _collect_options(stripped, is_bullet, i + 1)
             
             if len(question_text) >= 10 and len(options) >= 2:
-                # Ensure we have exactly 4 options
-                while len(options) < 4:
-                    options.append("")
-                
-                question_type = determine_question_type(question_text)
-                
-                question_data = {
-                    'question_number': f"GK_{question_counter:03d}",
-                    'question_text': question_text,
-                    'option_a': options[0] if len(options) > 0 else "",
-                    'option_b': options[1] if len(options) > 1 else "",
-                    'option_c': options[2] if len(options) > 2 else "",
-                    'option_d': options[3] if len(options) > 3 else "",
-                    'correct_answer': 'A',
-                    'question_type': question_type,
-                    'difficulty': 'Medium'
-                }
-                
-                additional_questions.append(question_data)
-                question_counter += 1
+                unnumbered.append((question_text, options))
                 logger.debug(f"Extracted additional question: {question_text[:50]}...")
         else:
             i += 1
     
+    # Unnumbered questions are numbered on from the numbered ones
+    additional_questions = [
+        _make_question(f"GK_{question_counter:03d}", question_text, options)
+        for question_counter, (question_text, options) in enumerate(unnumbered, len(questions) + 1)
+    ]
+    
     # Combine all questions
     all_questions = questions + additional_questions
     
     logger.info(f"Extracted {len(all_questions)} valid general knowledge questions ({len(questions)} numbered + {len(additional_questions)} additional)")
     return all_questions
 
+def _collect_options(stripped, is_bullet, i):
+    """Collect the bullet point options starting at line i; returns them and the next index."""
+    options = []
+    while i < len(stripped) and is_bullet[i]:
+        option_text = stripped[i].replace('●', '').strip()
+        if option_text:
+            options.append(option_text)
+        i += 1
+    return options, i
+
+def _make_question(question_number, question_text, options):
+    """Build a Question, padding the options out to four."""
+    # Ensure we have exactly 4 options
+    while len(options) < 4:
+        options.append("")
+    
+    return Question(
+        question_number,
+        question_text,
+        options[0],
+        options[1],
+        options[2],
+        options[3],
+        'A',  # Default to A since we don't have clear indicators
+        determine_question_type(question_text),
+        'Medium'
+    )
+
+@lru_cache(maxsize=4096)
 def determine_question_type(question_text):
     """Determine the type of general knowledge question based on content."""
     question_lower = question_text.lower()
     
-    # Define keywords for different categories
-    if any(word in question_lower for word in ['nigeria', 'nigerian', 'lagos', 'abuja', 'state', 'capital', 'warri', 'ondo', 'ekiti', 'jigawa']):
-        return 'Nigerian Geography/Politics'
-    elif any(word in question_lower for word in ['mountain', 'ocean', 'country', 'continent', 'capital', 'river', 'kilmanjaro', 'everest', 'tanzania']):
-        return 'World Geography'
-    elif any(word in question_lower for word in ['cup', 'olympics', 'sport', 'football', 'soccer', 'fifa', 'goal', 'score']):
-        return 'Sports'
-    elif any(word in question_lower for word in ['founded', 'inventor', 'discovered', 'history', 'century', 'tiktok', 'spacex']):
-        return 'History/Technology'
-    elif any(word in question_lower for word in ['colour', 'color', 'science', 'chemical', 'element', 'primary colours', 'water']):
-        return 'Science'
-    elif any(word in question_lower for word in ['idiom', 'saying', 'expression', 'phrase', 'apple of', 'feather in', 'chip of']):
-        return 'Language/Idioms'
-    elif any(word in question_lower for word in ['day', 'celebrated', 'holiday', 'festival', "woman's day"]):
-        return 'Culture/Events'
-    elif any(word in question_lower for word in ['astronomer', 'astrologer', 'surveyor', 'connoisseur', 'horticulturist']):
-        return 'Professions'
-    else:
-        return 'General Knowledge'
+    for pattern, question_type in _CATEGORY_RES:
+        if pattern.search(question_lower):
+            return question_type
+    return 'General Knowledge'
 
-def save_to_database(questions, db_path='edtech_questions_database.db'):
+def save_to_database(questions, db_path=DEFAULT_DB_PATH):
     """Save general knowledge questions to the database."""
-    conn = sqlite3.connect(db_path)
+    conn = get_conn(db_path)
     cursor = conn.cursor()
     
+    # question_type doubles as the category
+    rows = [(*question[:8], question.qtype, question.difficulty) for question in questions]
+    
+    # One prepared statement and a single commit for the whole batch; questions
+    # already stored under the same number and text are skipped
     saved_count = 0
-    for question in questions:
-        try:
-            cursor.execute("""
-                INSERT INTO general_knowledge_questions 
-                (question_number, question_text, option_a, option_b, option_c, option_d, correct_answer, question_type, category, difficulty_level)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                question['question_number'],
-                question['question_text'],
-                question['option_a'],
-                question['option_b'],
-                question['option_c'],
-                question['option_d'],
-                question['correct_answer'],
-                question['question_type'],
-                question['question_type'],  # Use question_type as category as well
-                question['difficulty']
-            ))
-            saved_count += 1
-        except Exception as e:
-            logger.error(f"Error saving question: {e}")
-    
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute('BEGIN')
+        cursor.executemany("""
+            INSERT OR IGNORE INTO general_knowledge_questions 
+            (question_number, question_text, option_a, option_b, option_c, option_d, correct_answer, question_type, category, difficulty_level)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        saved_count = cursor.rowcount
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Error saving questions: {e}")
     
     logger.info(f"Saved {saved_count} general knowledge questions to database")
     return saved_count
@@ -198,13 +181,13 @@ def print_sample_questions(questions, num_samples=5):
     """Print sample questions for verification."""
     print("\n=== Sample General Knowledge Questions ===")
     for i, q in enumerate(questions[:num_samples]):
-        print(f"\nQuestion {i+1} ({q['question_type']}):")
-        print(f"Q: {q['question_text']}")
-        print(f"A: {q['option_a']}")
-        print(f"B: {q['option_b']}")
-        print(f"C: {q['option_c']}")
-        print(f"D: {q['option_d']}")
-        print(f"Correct: {q['correct_answer']}")
+        print(f"\nQuestion {i+1} ({q.qtype}):")
+        print(f"Q: {q.text}")
+        print(f"A: {q.a}")
+        print(f"B: {q.b}")
+        print(f"C: {q.c}")
+        print(f"D: {q.d}")
+        print(f"Correct: {q.correct}")
 
 def print_statistics(questions):
     """Print extraction statistics."""
@@ -214,10 +197,7 @@ def print_statistics(questions):
         return
         
     # Count by type
-    type_counts = {}
-    for q in questions:
-        q_type = q['question_type']
-        type_counts[q_type] = type_counts.get(q_type, 0) + 1
+    type_counts = Counter(q.qtype for q in questions)
     
     print(f"\n=== General Knowledge Extraction Summary ===")
     print(f"Total questions in database: {len(questions)}")
@@ -1,31 +1,63 @@
 import re
 import sqlite3
 import logging
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from db import DEFAULT_DB_PATH, compile_keywords, get_conn, read_text
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Extracted question, fields in the column order of the INSERT
+Question = namedtuple('Question', 'number text a b c d correct qtype difficulty')
+
+# Question markers; the content is split into one block per match
+QUESTION_PATTERNS = [
+    r'(?:--)?(?:\*)?(?:Question(?:\s+\d+)?:?)(?:\*)?',
+    r'(?:--)?(?:\*)?(?:QUESTION(?:\s+\d+)?:?)(?:\*)?'
+]
+
+# Question splitting and option parsing patterns, compiled at import
+_QUESTION_START_RE = re.compile('|'.join(f'({pattern})' for pattern in QUESTION_PATTERNS),
+                                re.IGNORECASE | re.MULTILINE)
+_QHEADER_RE = re.compile(QUESTION_PATTERNS[0], re.IGNORECASE)
+_OPTIONS_MARKER_RE = re.compile(r'^[^\S\n]*\*?Options:[^\S\n]*$', re.MULTILINE)
+# Lettered ("A) ...") or bullet ("* ...") option lines, matched across the whole
+# options section; [^\S\n] keeps each match on one line and (.*\S) stops short
+# of trailing whitespace, as matching the stripped lines one by one did
+_BLOCK_OPTION_RE = re.compile(r'^[^\S\n]*(?:([A-D])[).]?[^\S\n]*(.*\S)|\*[^\S\n]*(.*\S))', re.MULTILINE)
+_INLINE_OPTION_RE = re.compile(r'([A-D])[).]?\s*([^\n]+)')
+_WS_RE = re.compile(r'\s+')
+
+# Separator and marker lines that are never question text or options
+_SEPARATORS = frozenset({'---', '--', '✅', '✔️', '*Options:', 'Options:'})
+
+# First characters a question header can start with ("--", "*", "Question")
+_QHEADER_FIRST = frozenset('-*qQ')
+
+# Topic keywords, checked in order; the first topic with a hit wins
+# (so 'sin' in 'using' still counts as Trigonometry)
+CATEGORY_KEYWORDS = [
+    ('Trigonometry', ['sin', 'cos', 'tan', 'angle', 'bearing', 'elevation']),
+    ('Calculus', ['derivative', 'integral', 'limit', 'differential']),
+    ('Statistics', ['mean', 'median', 'mode', 'probability', 'average', 'standard deviation']),
+    ('Algebra', ['equation', 'solve', 'quadratic', 'linear', 'x =', 'solve for']),
+    ('Geometry', ['area', 'volume', 'perimeter', 'radius', 'diameter', 'circle', 'rectangle', 'triangle']),
+]
+_CATEGORY_RES = compile_keywords(CATEGORY_KEYWORDS)
+
 def extract_mathematics_questions(text_file_path):
     """Extract mathematics questions from the converted text file."""
     logger.info(f"Starting mathematics extraction from {text_file_path}")
     
-    with open(text_file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
+    content = read_text(text_file_path)
     
     # Split content into chunks around question markers
-    # Look for various question patterns
-    question_patterns = [
-        r'(?:--)?(?:\*)?(?:Question(?:\s+\d+)?:?)(?:\*)?',
-        r'(?:--)?(?:\*)?(?:QUESTION(?:\s+\d+)?:?)(?:\*)?'
-    ]
-    
-    # Split content by any of the question patterns
-    combined_pattern = '|'.join(f'({pattern})' for pattern in question_patterns)
-    
     # Find all question starts
     question_starts = []
-    for match in re.finditer(combined_pattern, content, re.IGNORECASE | re.MULTILINE):
+    for match in _QUESTION_START_RE.finditer(content):
         question_starts.append(match.start())
     
     logger.info(f"Found {len(question_starts)} potential question starts")
@@ -42,7 +74,8 @@ def extract_mathematics_questions(text_file_path):
         # Clean and process the question
         question = process_question_block(question_block, i + 1)
         if question:
-            valid_questions.append(question)
+            # Number valid questions consecutively, e.g. MATH_001, MATH_002
+            valid_questions.append(question._replace(number=f"MATH_{len(valid_questions) + 1:03d}"))
     
     logger.info(f"Extracted {len(valid_questions)} valid mathematics questions")
     return valid_questions
@@ -56,56 +89,41 @@ def process_question_block(block, question_num):
         return None
     
     # Extract question text (everything before "Options:" or option markers)
-    lines = block.split('\n')
+    marker = _OPTIONS_MARKER_RE.search(block)
+    question_block = block[:marker.start()] if marker else block
     question_lines = []
     options = []
     correct_answer = None
     
-    collecting_question = True
-    collecting_options = False
-    
-    for line in lines:
+    for line in question_block.split('\n'):
         line = line.strip()
-        if not line:
-            continue
-            
-        # Skip various separators and markers
-        if line in ['---', '--', '✅', '✔️', '*Options:', 'Options:']:
-            if line in ['*Options:', 'Options:']:
-                collecting_question = False
-                collecting_options = True
+        
+        # Skip blanks, various separators and question headers/markers
+        if not line or line in _SEPARATORS or (line[0] in _QHEADER_FIRST and _QHEADER_RE.match(line)):
             continue
+        question_lines.append(line)
+    
+    if marker:
+        # Collect every option line after the marker in one regex sweep
+        for option_match in _BLOCK_OPTION_RE.finditer(block, marker.end()):
+            if option_match.group(0).strip() in _SEPARATORS:
+                continue
             
-        # Check if this is an option line
-        option_match = re.match(r'^([A-D])[).]?\s*(.+)', line)
-        bullet_option_match = re.match(r'^\*\s*(.+)', line)
-        
-        if collecting_options and (option_match or bullet_option_match):
-            if option_match:
+            if option_match.group(1):
                 option_letter = option_match.group(1)
-                option_text = option_match.group(2).strip()
+                option_text = option_match.group(2)
             else:
                 # For bullet options, assign letters A, B, C, D in order
                 option_letter = chr(65 + len(options))  # A=65, B=66, etc.
-                option_text = bullet_option_match.group(1).strip()
+                option_text = option_match.group(3)
             
             options.append({
                 'letter': option_letter,
                 'text': option_text
             })
-            
-        elif collecting_question:
-            # Skip question headers/markers
-            if re.match(r'(?:--)?(?:\*)?(?:Question(?:\s+\d+)?:?)(?:\*)?', line, re.IGNORECASE):
-                continue
-            question_lines.append(line)
-    
-    # Check if we found options after the question text ended
-    if not collecting_options and not options:
-        # Look for options in the remaining text
-        remaining_text = '\n'.join(lines)
-        option_pattern = r'([A-D])[).]?\s*([^\n]+)'
-        option_matches = re.findall(option_pattern, remaining_text)
+    else:
+        # No options marker; look for options anywhere in the block
+        option_matches = _INLINE_OPTION_RE.findall(block)
         for letter, text in option_matches:
             options.append({
                 'letter': letter,
@@ -116,7 +134,7 @@ def process_question_block(block, question_num):
     question_text = ' '.join(question_lines).strip()
     
     # Clean up question text
-    question_text = re.sub(r'\s+', ' ', question_text)
+    question_text = _WS_RE.sub(' ', question_text)
     question_text = question_text.replace('*', '').strip()
     
     # Validate question
@@ -136,65 +154,56 @@ def process_question_block(block, question_num):
     # Determine question type based on content
     question_type = determine_question_type(question_text)
     
-    return {
-        'question_text': question_text,
-        'option_a': next((opt['text'] for opt in options if opt['letter'] == 'A'), ''),
-        'option_b': next((opt['text'] for opt in options if opt['letter'] == 'B'), ''),
-        'option_c': next((opt['text'] for opt in options if opt['letter'] == 'C'), ''),
-        'option_d': next((opt['text'] for opt in options if opt['letter'] == 'D'), ''),
-        'correct_answer': correct_answer,
-        'question_type': question_type,
-        'difficulty': 'Medium'  # Default difficulty
-    }
+    # Map letters to texts once; built in reverse so a repeated letter keeps
+    # its first option
+    opt_map = {opt['letter']: opt['text'] for opt in reversed(options)}
+    
+    # The number is assigned by the caller once the question is known to be valid
+    return Question(
+        None,
+        question_text,
+        opt_map.get('A', ''),
+        opt_map.get('B', ''),
+        opt_map.get('C', ''),
+        opt_map.get('D', ''),
+        correct_answer,
+        question_type,
+        'Medium'  # Default difficulty
+    )
 
+@lru_cache(maxsize=4096)
 def determine_question_type(question_text):
     """Determine the type of mathematics question based on content."""
     question_lower = question_text.lower()
     
-    # Define keywords for different categories
-    if any(word in question_lower for word in ['sin', 'cos', 'tan', 'angle', 'bearing', 'elevation']):
-        return 'Trigonometry'
-    elif any(word in question_lower for word in ['derivative', 'integral', 'limit', 'differential']):
-        return 'Calculus'
-    elif any(word in question_lower for word in ['mean', 'median', 'mode', 'probability', 'average', 'standard deviation']):
-        return 'Statistics'
-    elif any(word in question_lower for word in ['equation', 'solve', 'quadratic', 'linear', 'x =', 'solve for']):
-        return 'Algebra'
-    elif any(word in question_lower for word in ['area', 'volume', 'perimeter', 'radius', 'diameter', 'circle', 'rectangle', 'triangle']):
-        return 'Geometry'
-    else:
-        return 'Arithmetic'
+    for pattern, question_type in _CATEGORY_RES:
+        if pattern.search(question_lower):
+            return question_type
+    return 'Arithmetic'
 
-def save_to_database(questions, db_path='edtech_questions_database.db'):
+def save_to_database(questions, db_path=DEFAULT_DB_PATH):
     """Save mathematics questions to the database."""
-    conn = sqlite3.connect(db_path)
+    conn = get_conn(db_path)
     cursor = conn.cursor()
     
+    # question_type doubles as the topic
+    rows = [(*question[:8], question.qtype, question.difficulty) for question in questions]
+    
+    # One prepared statement and a single commit for the whole batch; questions
+    # already stored under the same number and text are skipped
     saved_count = 0
-    for i, question in enumerate(questions):
-        try:
-            cursor.execute("""
-                INSERT INTO mathematics_questions 
-                (question_number, question_text, option_a, option_b, option_c, option_d, correct_answer, question_type, topic, difficulty_level)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                f"MATH_{i+1:03d}",  # Generate question number like MATH_001, MATH_002, etc.
-                question['question_text'],
-                question['option_a'],
-                question['option_b'],
-                question['option_c'],
-                question['option_d'],
-                question['correct_answer'],
-                question['question_type'],
-                question['question_type'],  # Use question_type as topic as well
-                question['difficulty']
-            ))
-            saved_count += 1
-        except Exception as e:
-            logger.error(f"Error saving question: {e}")
-    
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute('BEGIN')
+        cursor.executemany("""
+            INSERT OR IGNORE INTO mathematics_questions 
+            (question_number, question_text, option_a, option_b, option_c, option_d, correct_answer, question_type, topic, difficulty_level)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+        saved_count = cursor.rowcount
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Error saving questions: {e}")
     
     logger.info(f"Saved {saved_count} mathematics questions to database")
     return saved_count
@@ -203,13 +212,13 @@ def print_sample_questions(questions, num_samples=5):
     """Print sample questions for verification."""
     print("\n=== Sample Mathematics Questions ===")
     for i, q in enumerate(questions[:num_samples]):
-        print(f"\nQuestion {i+1} ({q['question_type']}):")
-        print(f"Q: {q['question_text']}")
-        print(f"A: {q['option_a']}")
-        print(f"B: {q['option_b']}")
-        print(f"C: {q['option_c']}")
-        print(f"D: {q['option_d']}")
-        print(f"Correct: {q['correct_answer']}")
+        print(f"\nQuestion {i+1} ({q.qtype}):")
+        print(f"Q: {q.text}")
+        print(f"A: {q.a}")
+        print(f"B: {q.b}")
+        print(f"C: {q.c}")
+        print(f"D: {q.d}")
+        print(f"Correct: {q.correct}")
 
 def print_statistics(questions):
     """Print extraction statistics."""
@@ -219,10 +228,7 @@ def print_statistics(questions):
         return
         
     # Count by type
-    type_counts = {}
-    for q in questions:
-        q_type = q['question_type']
-        type_counts[q_type] = type_counts.get(q_type, 0) + 1
+    type_counts = Counter(q.qtype for q in questions)
     
     print(f"\n=== Mathematics Extraction Summary ===")
     print(f"Total questions in database: {len(questions)}")
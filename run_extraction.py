@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Extraction Pipeline
+Runs the English, Mathematics and General Knowledge extractors in parallel, then saves their questions
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import improved_general_knowledge_extractor as general_knowledge
+import improved_mathematics_extractor as mathematics
+from extract_english_questions import EnglishQuestionExtractor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def extract_english_questions(text_file_path):
+    """Extract English questions; module-level so worker processes can run it."""
+    return EnglishQuestionExtractor().extract_questions(text_file_path)
+
+def run_pipeline(english_path='english_bank_complete.txt',
+                 mathematics_path='mathematics_bank.txt',
+                 general_knowledge_path='general_knowledge_bank.txt'):
+    """Extract every subject in parallel, then save each one in turn."""
+    # Parsing is CPU-bound and the subjects share no state, so each gets a process
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        english_future = executor.submit(extract_english_questions, english_path)
+        mathematics_future = executor.submit(mathematics.extract_mathematics_questions, mathematics_path)
+        general_knowledge_future = executor.submit(general_knowledge.extract_general_knowledge_questions,
+                                                   general_knowledge_path)
+        
+        english_questions = english_future.result()
+        mathematics_questions = mathematics_future.result()
+        general_knowledge_questions = general_knowledge_future.result()
+    
+    # SQLite allows one writer at a time, so the saves run serially here
+    english_extractor = EnglishQuestionExtractor()
+    english_extractor.create_database()
+    
+    return {
+        'English': english_extractor.save_to_database(english_questions),
+        'Mathematics': mathematics.save_to_database(mathematics_questions),
+        'General Knowledge': general_knowledge.save_to_database(general_knowledge_questions)
+    }
+
+def main():
+    """Run the full extraction pipeline"""
+    saved_counts = run_pipeline()
+    
+    print(f"\n=== Extraction Pipeline Summary ===")
+    for subject, count in saved_counts.items():
+        print(f"{subject}: {count} questions saved")
+    print(f"Total: {sum(saved_counts.values())} questions saved")
+
+if __name__ == "__main__":
+    main()
@@ -4,35 +4,54 @@ Unified Questions Database Manager
 Creates and manages a single database with separate tables for English, Mathematics, and General Knowledge
 """
 
+import copy
+import json
+import random
 import sqlite3
 import logging
 from datetime import datetime
+from pathlib import Path
+
+from db import QTYPE_INDEX_SQL
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _grouped_counts_sql(tables):
+    """Type distribution of the given tables in one statement as (t, question_type, cnt) rows"""
+    return ' UNION ALL '.join(
+        f"SELECT '{table}' AS t, question_type, COUNT(*) AS cnt FROM {table} GROUP BY question_type"
+        for table in tables
+    )
+
+def _stats_sql(tables):
+    """Grouped counts ordered by table and count"""
+    # Ties keep the question_type order the indexed per-table queries produced
+    return _grouped_counts_sql(tables) + ' ORDER BY t, 3 DESC, 2'
+
+def _summary_sql(tables):
+    """Grouped counts with each table's total and each type's share of it"""
+    # Window functions over the grouped counts do the arithmetic
+    return f'''
+        SELECT t, question_type, cnt, SUM(cnt) OVER w, 100.0 * cnt / SUM(cnt) OVER w
+        FROM ({_grouped_counts_sql(tables)})
+        WINDOW w AS (PARTITION BY t)
+        ORDER BY t, cnt DESC, question_type
+    '''
+
 class UnifiedQuestionDatabase:
-    def __init__(self, db_path: str = "edtech_questions_database.db"):
-        self.db_path = db_path
-        self.conn = None
-    
-    def connect(self):
-        """Connect to the database"""
-        self.conn = sqlite3.connect(self.db_path)
-        return self.conn
-    
-    def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+    # Subjects accepted by the query helpers; table names are only ever taken from here
+    _SUBJECTS = {
+        'english': 'english_questions',
+        'mathematics': 'mathematics_questions',
+        'general_knowledge': 'general_knowledge_questions',
+    }
+    TABLES = list(_SUBJECTS.values())
     
-    def create_all_tables(self):
-        """Create all subject tables in the unified database"""
-        conn = self.connect()
-        cursor = conn.cursor()
-        
+    # CREATE statement per table
+    _TABLE_DDL = {
         # English Questions Table
-        cursor.execute('''
+        'english_questions': '''
             CREATE TABLE IF NOT EXISTS english_questions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 question_number TEXT NOT NULL,
@@ -48,10 +67,10 @@ class UnifiedQuestionDatabase:
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
+        ''',
         
         # Mathematics Questions Table
-        cursor.execute('''
+        'mathematics_questions': '''
             CREATE TABLE IF NOT EXISTS mathematics_questions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 question_number TEXT NOT NULL,
@@ -68,10 +87,10 @@ class UnifiedQuestionDatabase:
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
+        ''',
         
         # General Knowledge Questions Table
-        cursor.execute('''
+        'general_knowledge_questions': '''
             CREATE TABLE IF NOT EXISTS general_knowledge_questions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 question_number TEXT NOT NULL,
@@ -88,10 +107,10 @@ class UnifiedQuestionDatabase:
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
+        ''',
         
         # Metadata table for database info
-        cursor.execute('''
+        'database_metadata': '''
             CREATE TABLE IF NOT EXISTS database_metadata (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 table_name TEXT NOT NULL,
@@ -100,95 +119,362 @@ class UnifiedQuestionDatabase:
                 extraction_source TEXT,
                 notes TEXT
             )
+        ''',
+    }
+    
+    # The whole schema as one script run in a single transaction: tables and
+    # question_type indexes. Earlier migrations appended a metadata row per
+    # run, so the newest row per table is kept before table_name gets its
+    # unique key. Stats come from grouped counts, so row-count triggers would
+    # only slow every write; any left by older versions are dropped
+    _SCHEMA_SCRIPT = ';\n'.join([
+        'BEGIN',
+        *_TABLE_DDL.values(),
+        *(QTYPE_INDEX_SQL.format(subject=subject) for subject in _SUBJECTS),
+        '''
+        DELETE FROM database_metadata
+        WHERE id NOT IN (SELECT MAX(id) FROM database_metadata GROUP BY table_name)
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_database_metadata_table_name
+        ON database_metadata(table_name)
+        ''',
+        *(f'DROP TRIGGER IF EXISTS trg_{table}_count_{event}'
+          for table in TABLES for event in ('ins', 'del')),
+        'COMMIT',
+    ])
+    
+    # (question_number, question_text) identifies a question, so loads can use
+    # INSERT OR IGNORE; the unique index is only built once a table holds no
+    # duplicates (see remove_duplicate_questions)
+    _QUESTION_KEY_SQL = {
+        table: f'''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_{subject}_qnum_text
+            ON {table}(question_number, question_text)
+        '''
+        for subject, table in _SUBJECTS.items()
+    }
+    
+    # Columns carried over from the standalone English database
+    _MIGRATED_COLUMNS = (
+        'question_number', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+        'correct_answer', 'question_type', 'created_at',
+    )
+    
+    # Stats and summary statements over all three subject tables
+    _STATS_SQL = _stats_sql(TABLES)
+    _SUMMARY_SQL = _summary_sql(TABLES)
+    
+    # Fixed statement text per subject, so the connection's statement cache
+    # hands back the already-prepared statements on every call:
+    # (all ids, ids of one question_type, rows for a JSON list of ids)
+    _RANDOM_SQL = {
+        subject: (
+            f'SELECT id FROM {table}',
+            f'SELECT id FROM {table} WHERE question_type = ?',
+            f'''
+            SELECT id, question_number, question_text, option_a, option_b, option_c, option_d, 
+                   correct_answer, question_type
+            FROM {table}
+            WHERE id IN (SELECT value FROM json_each(?))
+            ''',
+        )
+        for subject, table in _SUBJECTS.items()
+    }
+    
+    def __init__(self, db_path: str = "edtech_questions_database.db"):
+        self.db_path = db_path
+        self.conn = None
+        # Read-only connection for the stats, summary and sampling queries
+        self._ro_conn = None
+        # ((data_version, total_changes), stats) from the last get_table_stats call
+        self._stats_cache = None
+        # ((data_version, total_changes), {(subject, question_type): ids}) for get_random_questions
+        self._ids_cache = None
+    
+    def __enter__(self):
+        self.connect()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def connect(self):
+        """Connect to the database, reusing the open connection if there is one"""
+        if self.conn is not None:
+            return self.conn
+        
+        # Column values come back as stored; in particular created_at stays the
+        # TEXT timestamp SQLite wrote rather than being parsed into datetime
+        self.conn = sqlite3.connect(self.db_path, detect_types=0, cached_statements=256)
+        
+        # WAL lets readers run alongside the writer, and with synchronous=NORMAL
+        # commits skip the per-transaction fsync; reads go through a memory map
+        # (SQLite maps only the pages it touches, up to 1 GiB) instead of read()
+        # calls. Neither WAL nor mmap applies to an in-memory database.
+        # page_size and auto_vacuum only take effect while the file is still
+        # empty, so they run before journal_mode=WAL writes the header; on an
+        # existing database they are no-ops
+        pragmas = """
+            PRAGMA page_size=8192;
+            PRAGMA auto_vacuum=INCREMENTAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-65536;
+        """
+        if self.db_path != ':memory:':
+            pragmas += """
+            PRAGMA journal_mode=WAL;
+            PRAGMA mmap_size=1073741824;
+            """
+        self.conn.executescript(pragmas)
+        return self.conn
+    
+    def read_connection(self):
+        """Return the read-only connection, opening it after the writer on first use"""
+        if self._ro_conn is not None:
+            return self._ro_conn
+        
+        # An in-memory database exists only inside the writer connection
+        conn = self.connect()
+        if self.db_path == ':memory:':
+            return conn
+        
+        # In WAL mode this connection reads the last committed snapshot without
+        # blocking, or being blocked by, the writer; query_only guards against
+        # a write slipping through it
+        self._ro_conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                                        uri=True, detect_types=0, cached_statements=256)
+        self._ro_conn.executescript("""
+            PRAGMA query_only=1;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-65536;
+            PRAGMA mmap_size=1073741824;
+        """)
+        return self._ro_conn
+    
+    def close(self):
+        """Close database connections"""
+        if self._ro_conn:
+            self._ro_conn.close()
+            self._ro_conn = None
+        if self.conn:
+            # Let SQLite refresh planner statistics for the queries it saw
+            self.conn.execute('PRAGMA optimize')
+            self.conn.close()
+            self.conn = None
+            # The cache keys are only meaningful for the connection that produced them
+            self._stats_cache = None
+            self._ids_cache = None
+    
+    def create_all_tables(self):
+        """Create all subject tables in the unified database"""
+        conn = self.connect()
+        
+        try:
+            conn.executescript(self._SCHEMA_SCRIPT)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        
+        self.create_question_keys(conn)
+        
+        logger.info(f"All tables created in {self.db_path}")
+        return conn
+    
+    def _duplicate_count(self, cursor, table):
+        """Number of rows repeating an earlier (question_number, question_text)"""
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(copies - 1), 0)
+            FROM (SELECT COUNT(*) AS copies FROM {table} GROUP BY question_number, question_text)
         ''')
+        return cursor.fetchone()[0]
+    
+    def create_question_keys(self, conn=None):
+        """Build the unique question key on every table without duplicate questions"""
+        conn = conn or self.connect()
+        cursor = conn.cursor()
+        
+        existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for subject, table in self._SUBJECTS.items():
+            if f'idx_{subject}_qnum_text' in existing:
+                continue
+            
+            # Never drop stored questions while setting up the schema; leave
+            # the table unkeyed until duplicates are removed explicitly
+            duplicates = self._duplicate_count(cursor, table)
+            if duplicates:
+                logger.warning(f"{table} has {duplicates} duplicate questions; "
+                               f"run remove_duplicate_questions() to add its unique key")
+                continue
+            cursor.execute(self._QUESTION_KEY_SQL[table])
         
         conn.commit()
-        logger.info(f"All tables created in {self.db_path}")
         return conn
     
-    def get_table_stats(self):
-        """Get statistics for all tables"""
+    def remove_duplicate_questions(self):
+        """Delete later copies of repeated questions and add the unique keys"""
         conn = self.connect()
         cursor = conn.cursor()
         
-        stats = {}
-        tables = ['english_questions', 'mathematics_questions', 'general_knowledge_questions']
+        removed = 0
+        try:
+            cursor.execute('BEGIN')
+            for table in self.TABLES:
+                # The first copy of each (question_number, question_text) is kept
+                cursor.execute(f'''
+                    DELETE FROM {table}
+                    WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY question_number, question_text)
+                ''')
+                removed += cursor.rowcount
+                cursor.execute(self._QUESTION_KEY_SQL[table])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
         
-        for table in tables:
-            try:
-                cursor.execute(f'SELECT COUNT(*) FROM {table}')
-                count = cursor.fetchone()[0]
-                
-                cursor.execute(f'SELECT COUNT(DISTINCT question_type) FROM {table}')
-                types_count = cursor.fetchone()[0]
-                
-                cursor.execute(f'SELECT question_type, COUNT(*) FROM {table} GROUP BY question_type ORDER BY COUNT(*) DESC')
-                type_distribution = cursor.fetchall()
-                
-                stats[table] = {
-                    'total_questions': count,
-                    'question_types': types_count,
-                    'type_distribution': type_distribution
-                }
-            except sqlite3.OperationalError:
-                stats[table] = {'total_questions': 0, 'question_types': 0, 'type_distribution': []}
+        # Hand the freed pages back to the filesystem (a no-op unless the file
+        # was created with incremental auto_vacuum). The pragma frees one page
+        # per step and returns no columns, so execute() would stop after the
+        # first; executescript() steps it to the end
+        conn.executescript('PRAGMA incremental_vacuum')
         
-        conn.close()
-        return stats
+        logger.info(f"Removed {removed} duplicate questions")
+        return removed
+    
+    def _data_version(self, conn):
+        """Key that changes whenever the tables may have changed"""
+        # data_version moves when another connection commits and total_changes
+        # when this one writes (only possible when reads share the in-memory
+        # writer), so together they tell whether the tables changed
+        return (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+    
+    def _query_subject_tables(self, conn, sql, build_sql):
+        """Run a statement over all subject tables, leaving out any the database lacks"""
+        try:
+            return conn.execute(sql)
+        except sqlite3.OperationalError:
+            # A database that never went through create_all_tables; report the
+            # tables it does have and zeros for the rest
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            tables = [table for table in self.TABLES if table in existing]
+            if len(tables) == len(self.TABLES):
+                raise
+            return conn.execute(build_sql(tables)) if tables else iter(())
+    
+    def get_table_stats(self):
+        """Get statistics for all tables"""
+        conn = self.read_connection()
+        
+        version = self._data_version(conn)
+        if self._stats_cache is not None and self._stats_cache[0] == version:
+            return copy.deepcopy(self._stats_cache[1])
+        
+        # One parse and one pass over the covering indexes for all three tables;
+        # the totals and type counts are derived from the grouped rows, so they
+        # always agree with the distribution
+        stats = {table: {'total_questions': 0, 'question_types': 0, 'type_distribution': []}
+                 for table in self.TABLES}
+        for table, q_type, type_count in self._query_subject_tables(conn, self._STATS_SQL, _stats_sql):
+            data = stats[table]
+            data['total_questions'] += type_count
+            # COUNT(DISTINCT question_type) ignored NULL types
+            if q_type is not None:
+                data['question_types'] += 1
+            data['type_distribution'].append((q_type, type_count))
+        
+        self._stats_cache = (version, stats)
+        return copy.deepcopy(stats)
     
     def migrate_english_questions(self, old_db_path: str = "english_questions.db"):
         """Migrate existing English questions to the unified database"""
         try:
-            # Connect to old database
-            old_conn = sqlite3.connect(old_db_path)
-            old_cursor = old_conn.cursor()
-            
-            # Get all questions from old database
-            old_cursor.execute('''
-                SELECT question_number, question_text, option_a, option_b, option_c, option_d, 
-                       correct_answer, question_type, created_at
-                FROM english_questions
-            ''')
-            questions = old_cursor.fetchall()
-            old_conn.close()
-            
-            # Insert into new unified database
+            # Insert into new unified database; build the schema only if it is
+            # missing (the metadata key is the last piece the upsert below needs)
             conn = self.connect()
             cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM sqlite_master
+                WHERE type = 'index' AND name = 'idx_database_metadata_table_name'
+            ''')
+            if cursor.fetchone() is None:
+                self.create_all_tables()
+            
+            # Attach the old database so the copy runs entirely inside SQLite
+            cursor.execute('ATTACH DATABASE ? AS old_db', (old_db_path,))
             
-            # Clear existing English questions if any
-            cursor.execute('DELETE FROM english_questions')
+            # The source database is left untouched, so a crash mid-copy is
+            # recovered by re-running; skip the fsyncs for the bulk load only
+            old_sync = cursor.execute('PRAGMA synchronous').fetchone()[0]
+            cursor.execute('PRAGMA synchronous=OFF')
+            try:
+                # Copy the columns both schemas share, so an older or newer source
+                # table still migrates; missing columns take their defaults
+                source_columns = {row[1] for row in cursor.execute('PRAGMA old_db.table_info(english_questions)')}
+                if not source_columns:
+                    raise sqlite3.OperationalError('no such table: old_db.english_questions')
+                columns = ', '.join(c for c in self._MIGRATED_COLUMNS if c in source_columns)
+                
+                # Add the questions not already present in a single transaction,
+                # so re-running the migration only copies what is new. NOT EXISTS
+                # skips stored questions even while duplicates keep the unique
+                # key from being built; OR IGNORE also drops repeats within the
+                # source once it is
+                cursor.execute('BEGIN')
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO english_questions ({columns})
+                    SELECT {columns} FROM old_db.english_questions AS old
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM english_questions AS e
+                        WHERE e.question_number = old.question_number
+                          AND e.question_text = old.question_text
+                    )
+                ''')
+                migrated_count = cursor.rowcount
+                
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute('DETACH DATABASE old_db')
+                cursor.execute(f'PRAGMA synchronous={old_sync}')
             
-            # Insert migrated questions
-            for question in questions:
-                cursor.execute('''
-                    INSERT INTO english_questions 
-                    (question_number, question_text, option_a, option_b, option_c, option_d, 
-                     correct_answer, question_type, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', question)
+            # Refresh planner statistics after the bulk load so the
+            # question_type index is chosen for grouping and filtering
+            cursor.execute('ANALYZE english_questions')
             
-            conn.commit()
-            logger.info(f"Migrated {len(questions)} English questions to unified database")
+            logger.info(f"Migrated {migrated_count} new English questions to unified database")
             
-            # Update metadata
+            # Update metadata with the table's row count after the copy (the
+            # WHERE keeps ON CONFLICT from parsing as a join constraint)
             cursor.execute('''
-                INSERT OR REPLACE INTO database_metadata 
-                (table_name, total_questions, extraction_source, notes)
-                VALUES (?, ?, ?, ?)
-            ''', ('english_questions', len(questions), old_db_path, 'Migrated from separate English database'))
+                INSERT INTO database_metadata (table_name, total_questions, extraction_source, notes)
+                SELECT ?, COUNT(*), ?, ? FROM english_questions WHERE true
+                ON CONFLICT(table_name) DO UPDATE SET
+                    total_questions = excluded.total_questions,
+                    extraction_source = excluded.extraction_source,
+                    notes = excluded.notes,
+                    last_updated = CURRENT_TIMESTAMP
+            ''', ('english_questions', old_db_path, 'Migrated from separate English database'))
             
             conn.commit()
-            conn.close()
-            return len(questions)
-            
+            return migrated_count
+        
         except Exception as e:
             logger.error(f"Error migrating English questions: {e}")
             return 0
     
     def print_database_summary(self):
         """Print a summary of the unified database"""
-        stats = self.get_table_stats()
+        conn = self.read_connection()
+        
+        totals = dict.fromkeys(self.TABLES, 0)
+        distributions = {table: [] for table in self.TABLES}
+        for table, q_type, type_count, count, percentage in self._query_subject_tables(
+                conn, self._SUMMARY_SQL, _summary_sql):
+            totals[table] = count
+            distributions[table].append((q_type, type_count, percentage))
         
         print(f"\n{'='*60}")
         print(f"EDTECH QUESTIONS DATABASE SUMMARY")
@@ -196,17 +482,15 @@ class UnifiedQuestionDatabase:
         print(f"Database: {self.db_path}")
         
         total_questions = 0
-        for table, data in stats.items():
+        for table, count in totals.items():
             subject = table.replace('_questions', '').replace('_', ' ').title()
-            count = data['total_questions']
             total_questions += count
             
             print(f"\n{subject}:")
             print(f"  Total Questions: {count}")
-            if data['type_distribution']:
+            if distributions[table]:
                 print(f"  Question Types:")
-                for q_type, type_count in data['type_distribution']:
-                    percentage = (type_count / count * 100) if count > 0 else 0
+                for q_type, type_count, percentage in distributions[table]:
                     print(f"    {q_type}: {type_count} ({percentage:.1f}%)")
         
         print(f"\nGRAND TOTAL: {total_questions} questions across all subjects")
@@ -214,44 +498,50 @@ class UnifiedQuestionDatabase:
     
     def get_random_questions(self, subject: str, count: int = 10, question_type: str = None):
         """Get random questions from a specific subject"""
-        table_name = f"{subject}_questions"
-        conn = self.connect()
+        if subject not in self._SUBJECTS:
+            raise ValueError(f"Unknown subject: {subject!r}")
+        all_ids_sql, type_ids_sql, rows_sql = self._RANDOM_SQL[subject]
+        conn = self.read_connection()
         cursor = conn.cursor()
         
-        query = f'''
-            SELECT id, question_number, question_text, option_a, option_b, option_c, option_d, 
-                   correct_answer, question_type
-            FROM {table_name}
-            WHERE 1=1
-        '''
-        params = []
+        # Sample from the candidate ids and fetch just those rows by primary key,
+        # rather than sorting the table with ORDER BY RANDOM(). The id lists are
+        # read once (an index-only scan) and reused until the data changes
+        version = self._data_version(conn)
+        if self._ids_cache is None or self._ids_cache[0] != version:
+            self._ids_cache = (version, {})
+        question_type = question_type or None
+        ids = self._ids_cache[1].get((subject, question_type))
+        if ids is None:
+            if question_type:
+                cursor.execute(type_ids_sql, (question_type,))
+            else:
+                cursor.execute(all_ids_sql)
+            ids = [row[0] for row in cursor]
+            self._ids_cache[1][(subject, question_type)] = ids
         
-        if question_type:
-            query += ' AND question_type = ?'
-            params.append(question_type)
+        # A negative count used to mean no LIMIT
+        sample = random.sample(ids, len(ids) if count < 0 else min(count, len(ids)))
         
-        query += ' ORDER BY RANDOM() LIMIT ?'
-        params.append(count)
-        
-        cursor.execute(query, params)
+        cursor.execute(rows_sql, (json.dumps(sample),))
         questions = cursor.fetchall()
-        conn.close()
+        random.shuffle(questions)
         
         return questions
 
 
 def main():
     """Main function to set up the unified database"""
-    db = UnifiedQuestionDatabase()
-    
-    # Create all tables
-    db.create_all_tables()
-    
-    # Migrate existing English questions
-    migrated_count = db.migrate_english_questions()
-    
-    # Print summary
-    db.print_database_summary()
+    # One connection serves every step and is closed once at the end
+    with UnifiedQuestionDatabase() as db:
+        # Create all tables
+        db.create_all_tables()
+        
+        # Migrate existing English questions
+        migrated_count = db.migrate_english_questions()
+        
+        # Print summary
+        db.print_database_summary()
     
     print(f"\n✅ Unified database setup complete!")
     print(f"📁 Database file: {db.db_path}")